@@ -27,6 +27,7 @@ from __future__ import absolute_import, print_function
 
 __docformat__ = "restructuredtext en"
 
+from bisect import bisect_right
 import math
 
 import pywws.localisation
@@ -79,7 +80,7 @@ def temp_f(c):
     "Convert temperature from Celsius to Fahrenheit"
     if c is None:
         return None
-    return (c * 9.0 / 5.0) + 32.0
+    return (c * 1.8) + 32.0
 
 def winddir_average(data, threshold, min_count, decay=1.0):
     """Compute average wind direction (in degrees) for a slice of data.
@@ -151,8 +152,6 @@ def winddir_text(pts):
     global _winddir_text_array
     if pts is None:
         return None
-    if not isinstance(pts, int):
-        pts = int(pts + 0.5) % 16
     if not _winddir_text_array:
         _ = pywws.localisation.translation.ugettext
         _winddir_text_array = (
@@ -161,7 +160,7 @@ def winddir_text(pts):
             _(u'S'), _(u'SSW'), _(u'SW'), _(u'WSW'),
             _(u'W'), _(u'WNW'), _(u'NW'), _(u'NNW'),
             )
-    return _winddir_text_array[pts]
+    return _winddir_text_array[int(pts + 0.5) & 15]
 
 def wind_kmph(ms):
     "Convert wind from metres per second to kilometres per hour"
@@ -182,10 +181,7 @@ def wind_bft(ms):
     "Convert wind from metres per second to Beaufort scale"
     if ms is None:
         return None
-    for bft in range(len(_bft_threshold)):
-        if ms < _bft_threshold[bft]:
-            return bft
-    return len(_bft_threshold)
+    return bisect_right(_bft_threshold, ms)
 
 def dew_point(temp, hum):
     """Compute dew point, using formula from
@@ -28,7 +28,9 @@ from __future__ import absolute_import, print_function, unicode_literals
 from ast import literal_eval
 from collections import deque
 from datetime import datetime, timedelta
+from multiprocessing.pool import ThreadPool
 import os
+import socket
 import sys
 import threading
 
@@ -61,6 +63,71 @@ class Queue(deque):
         return len(self) >= 50
 
 
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def http_session():
+    """Get a :py:class:`requests.Session` shared by all uploaders.
+
+    Sharing one session allows HTTP connections to be kept open and
+    reused between uploads, and between services that use the same
+    server. Don't change the session's headers, parameters or
+    authentication, as other services would see the changes. Pass them
+    with each request instead.
+
+    Failed connections and "server error" responses are retried up to
+    three times, with an increasing delay, before the error is returned
+    to the uploader. A server's ``Retry-After`` header is ignored, so a
+    busy server can't hold up an uploader thread for as long as it
+    asks. TCP keep-alive is enabled so that idle connections
+    aren't silently dropped by routers between uploads.
+
+    The :py:mod:`requests` module is only imported when this function
+    is first called, as not all services need it. Services that use the
+    session should still import :py:mod:`requests` at module level, so
+    that a missing dependency is reported at start-up.
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.connection import HTTPConnection
+            from urllib3.util.retry import Retry
+
+            socket_options = HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                # not available on all platforms
+                socket_options += [
+                    (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60),
+                    (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 30)]
+
+            class KeepAliveAdapter(HTTPAdapter):
+                def init_poolmanager(self, *args, **kwds):
+                    kwds['socket_options'] = socket_options
+                    super(KeepAliveAdapter, self).init_poolmanager(
+                        *args, **kwds)
+
+            retry = {'total': 3, 'backoff_factor': 1,
+                     'status_forcelist': (500, 502, 503, 504),
+                     'raise_on_status': False,
+                     'respect_retry_after_header': False}
+            methods = frozenset(('GET', 'POST'))
+            try:
+                retry = Retry(allowed_methods=methods, **retry)
+            except TypeError:
+                # urllib3 < 1.26
+                retry = Retry(method_whitelist=methods, **retry)
+            _http_session = requests.Session()
+            adapter = KeepAliveAdapter(
+                pool_connections=8, pool_maxsize=16, max_retries=retry)
+            _http_session.mount('http://', adapter)
+            _http_session.mount('https://', adapter)
+    return _http_session
+
+
 class ServiceBase(threading.Thread):
     """Base class for all service uploaders.
 
@@ -120,15 +187,18 @@ class ServiceBase(threading.Thread):
         # get user configuration
         self.params = {}
         check = []
+        fixed_data = {}
         for key, (default, required, fixed_key) in self.config.items():
             self.params[key] = context.params.get(
                 self.service_name, key, default)
             if required:
                 check.append(key)
             if fixed_key and self.params[key]:
-                # copy fixed_data to avoid changing class definition
-                self.fixed_data = dict(self.fixed_data)
-                self.fixed_data[fixed_key] = self.params[key]
+                fixed_data[fixed_key] = self.params[key]
+        if fixed_data:
+            # copy fixed_data to avoid changing class definition
+            self.fixed_data = dict(self.fixed_data)
+            self.fixed_data.update(fixed_data)
         # check values
         if check_params:
             self.check_params(*check)
@@ -203,6 +273,27 @@ class ServiceBase(threading.Thread):
             self.logger.error(message)
             self.old_message = message
 
+    _pool = None
+
+    def _map(self, func, items):
+        """Return a list of ``func(item)`` for each of ``items``.
+
+        If there is more than one item they are processed in parallel
+        by a pool of ``parallel_uploads`` threads. The pool is created
+        when first needed and must be stopped with :py:meth:`_close_pool`.
+        """
+        if len(items) < 2:
+            return [func(x) for x in items]
+        if not self._pool:
+            self._pool = ThreadPool(self.parallel_uploads)
+        return self._pool.map(func, items)
+
+    def _close_pool(self):
+        if self._pool:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
 
 class DataServiceBase(ServiceBase):
     """Base class for "data" services.
@@ -301,6 +392,34 @@ class CatchupDataService(DataServiceBase):
     service is first used.
     """
 
+    batch_size = 1
+    """Sets the maximum number of data sets sent in one upload. Services
+    that can accept more than one data set at a time should set this
+    greater than 1 and implement :py:meth:`upload_data_batch`. This can
+    greatly speed up "catchup" uploads.
+    """
+
+    parallel_uploads = 1
+    """Sets the maximum number of uploads that can be in progress at
+    the same time. Setting this greater than 1 can speed up "catchup"
+    uploads to services that don't need data to arrive in time order.
+    The :py:meth:`~DataServiceBase.upload_data` or
+    :py:meth:`upload_data_batch` method must then be thread safe.
+    """
+
+    def upload_data_batch(self, session, prepared_data=[]):
+        """Upload several data sets to the service.
+
+        Data service classes that set :py:attr:`batch_size` greater
+        than 1 must implement this method.
+
+        :param object session: the object created by
+            :py:meth:`~ServiceBase.session`.
+        :param list prepared_data: a list of :py:obj:`dict` objects,
+            each as passed to :py:meth:`~DataServiceBase.upload_data`.
+        """
+        raise NotImplementedError()
+
     def queue_data(self, timestamp, data):
         if timestamp and timestamp < self.last_update + self.interval:
             return False
@@ -342,35 +461,61 @@ class CatchupDataService(DataServiceBase):
         if live_data:
             self.queue_data(live_data['idx'], live_data)
 
+    def _upload_group(self, session, group):
+        if self.batch_size > 1:
+            return self.upload_data_batch(
+                session, prepared_data=[x[1] for x in group])
+        return self.upload_data(session, prepared_data=group[0][1])
+
     def upload_batch(self):
+        try:
+            OK, count = self._upload_queue()
+        finally:
+            self._close_pool()
+        if count > 1:
+            self.logger.warning('{:d} records sent'.format(count))
+        elif count:
+            self.logger.info('1 record sent')
+        return OK
+
+    def _upload_queue(self):
         OK = True
         count = 0
+        size = self.batch_size * self.parallel_uploads
         with self.session() as (session, message):
             if not session:
                 self.log(message)
             while session and self.queue and not self.context.shutdown.is_set():
-                # send upload without taking it off queue
-                upload = self.queue[0]
-                if upload is None:
+                # send uploads without taking them off queue
+                batch = []
+                for i in range(min(len(self.queue), size)):
+                    upload = self.queue[i]
+                    if upload is None:
+                        break
+                    batch.append(upload)
+                if not batch:
                     OK = False
                     break
-                timestamp, prepared_data = upload
-                OK, message = self.upload_data(
-                    session, prepared_data=prepared_data)
-                self.log(message)
+                groups = [batch[i:i + self.batch_size]
+                          for i in range(0, len(batch), self.batch_size)]
+                results = self._map(
+                    lambda x: self._upload_group(session, x), groups)
+                # process results in order, stopping at first failure
+                for group, (OK, message) in zip(groups, results):
+                    self.log(message)
+                    if not OK:
+                        break
+                    count += len(group)
+                    timestamp = group[-1][0]
+                    if timestamp:
+                        self.context.status.set(
+                            'last update', self.service_name, str(timestamp))
+                    # finally remove uploads from queue
+                    for upload in group:
+                        self.queue.popleft()
                 if not OK:
                     break
-                count += 1
-                if timestamp:
-                    self.context.status.set(
-                        'last update', self.service_name, str(timestamp))
-                # finally remove upload from queue
-                self.queue.popleft()
-        if count > 1:
-            self.logger.warning('{:d} records sent'.format(count))
-        elif count:
-            self.logger.info('1 record sent')
-        return OK
+        return OK, count
 
 
 class LiveDataService(DataServiceBase):
@@ -424,6 +569,12 @@ class FileService(ServiceBase):
     """Base class for "file" services.
 
     """
+    parallel_uploads = 1
+    """Sets the maximum number of files that can be uploaded at the same
+    time. If this is greater than 1 the :py:meth:`upload_file` method
+    must be thread safe.
+    """
+
     def do_catchup(self, do_all=False):
         self.upload(options=literal_eval(
             self.context.status.get('pending', self.service_name, '[]')))
@@ -435,7 +586,23 @@ class FileService(ServiceBase):
                 continue
             self.queue.append(item)
 
+    def _upload_one(self, session, upload):
+        if os.path.isabs(upload):
+            path = upload
+        else:
+            path = os.path.join(self.context.output_dir, upload)
+        if not os.path.isfile(path):
+            return None
+        self.logger.debug('file: %s', path)
+        return self.upload_file(session, path)
+
     def upload_batch(self):
+        try:
+            return self._upload_queue()
+        finally:
+            self._close_pool()
+
+    def _upload_queue(self):
         pending = literal_eval(
             self.context.status.get('pending', self.service_name, '[]'))
         OK = True
@@ -444,31 +611,38 @@ class FileService(ServiceBase):
             if not session:
                 self.log(message)
             while session and self.queue and not self.context.shutdown.is_set():
-                upload = self.queue[0]
-                if upload is None:
+                batch = []
+                for i in range(min(len(self.queue), self.parallel_uploads)):
+                    upload = self.queue[i]
+                    if upload is None:
+                        break
+                    batch.append(upload)
+                if not batch:
                     OK = False
                     break
-                if os.path.isabs(upload):
-                    path = upload
-                else:
-                    path = os.path.join(self.context.output_dir, upload)
-                if not os.path.isfile(path):
-                    if upload in pending:
-                        pending.remove(upload)
+                results = self._map(
+                    lambda x: self._upload_one(session, x), batch)
+                # process results in order, stopping at first failure
+                for upload, result in zip(batch, results):
+                    if result is None:
+                        # file doesn't exist
+                        if upload in pending:
+                            pending.remove(upload)
+                        self.queue.popleft()
+                        continue
+                    OK, message = result
+                    self.log(message)
+                    if OK:
+                        if upload in pending:
+                            pending.remove(upload)
+                        count += 1
+                    else:
+                        if upload not in pending:
+                            pending.append(upload)
+                        break
                     self.queue.popleft()
-                    continue
-                self.logger.debug('file: %s', path)
-                OK, message = self.upload_file(session, path)
-                self.log(message)
-                if OK:
-                    if upload in pending:
-                        pending.remove(upload)
-                    count += 1
-                else:
-                    if upload not in pending:
-                        pending.append(upload)
+                if not OK:
                     break
-                self.queue.popleft()
         self.context.status.set('pending', self.service_name, repr(pending))
         if count > 1:
             self.logger.info('{:d} uploads'.format(count))
@@ -104,8 +104,7 @@ class ToService(pywws.service.CatchupDataService):
 
     @contextmanager
     def session(self):
-        with requests.Session() as session:
-            yield session, 'OK'
+        yield pywws.service.http_session(), 'OK'
 
     def rain_rate(self, data):
         # compute rain since last upload
@@ -123,9 +122,9 @@ class ToService(pywws.service.CatchupDataService):
             data['rain'] - self.context.calib_data[day_start]['rain'], 0.0)
 
     def valid_data(self, data):
-        return any([data[x] is not None for x in (
+        return any(data[x] is not None for x in (
             'wind_dir', 'wind_ave', 'wind_gust', 'hum_out', 'temp_out',
-            'rel_pressure')])
+            'rel_pressure'))
 
     def upload_data(self, session, prepared_data={}):
         try:
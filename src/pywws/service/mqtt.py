@@ -156,6 +156,7 @@ import os
 import pprint
 import ssl
 import sys
+import threading
 
 import paho.mqtt.client as mosquitto
 
@@ -234,6 +235,27 @@ class ToService(pywws.service.LiveDataService):
         # convert some params from string
         for key in ('port', 'retain', 'tls_ver', 'multi_topic', 'selfcert'):
             self.params[key] = literal_eval(self.params[key])
+        # create one client, reused for every upload
+        self._started = False
+        self._connected = threading.Event()
+        self._client = mosquitto.Client(
+            self.params['client_id'], protocol=mosquitto.MQTTv31)
+        self._client.on_connect = self._on_connect
+        self._client.on_disconnect = self._on_disconnect
+        self._client.reconnect_delay_set(min_delay=1, max_delay=30)
+        if self.params['password']:
+            self._client.username_pw_set(
+                self.params['user'], self.params['password'])
+        elif self.params['user']:
+            self._client.username_pw_set(self.params['user'])
+        if self.params['tls_cert']:
+            if self.params['selfcert']:
+                self._client.tls_set(
+                    self.params['tls_cert'], tls_version=self.params['tls_ver'],
+                    cert_reqs=ssl.CERT_NONE)
+            else:
+                self._client.tls_set(
+                    self.params['tls_cert'], tls_version=self.params['tls_ver'])
 
     def template_format(self, template):
         result = []
@@ -244,41 +266,51 @@ class ToService(pywws.service.LiveDataService):
 
     @contextmanager
     def session(self):
-        session = mosquitto.Client(
-            self.params['client_id'], protocol=mosquitto.MQTTv31)
-        if self.params['password']:
-            session.username_pw_set(
-                self.params['user'], self.params['password'])
-        elif self.params['user']:
-            session.username_pw_set(self.params['user'])
-        logger.debug(('connecting to host {hostname:s}:{port:d} '
-                      'with client_id "{client_id:s}"').format(**self.params))
-        if self.params['tls_cert']:
-            selfcert = False
-            if self.params['selfcert']:
-                selfcert = self.params['selfcert']
-
-            if selfcert:
-                session.tls_set(self.params['tls_cert'], tls_version=self.params['tls_ver'], cert_reqs=ssl.CERT_NONE)
-            else:
-                session.tls_set(self.params['tls_cert'], tls_version=self.params['tls_ver'])
-
-        session.connect(self.params['hostname'], self.params['port'])
-
+        if not self._started:
+            logger.debug(('connecting to host {hostname:s}:{port:d} '
+                          'with client_id "{client_id:s}"').format(
+                              **self.params))
+            self._client.connect(self.params['hostname'], self.params['port'])
+            # network thread handles keepalive and reconnection
+            self._client.loop_start()
+            self._started = True
+            # give the broker time to accept the connection
+            self._connected.wait(10)
+        if self._connected.is_set():
+            yield self._client, 'OK'
+        else:
+            yield None, 'not connected to broker'
+
+    def _on_connect(self, client, userdata, flags, rc, *args):
+        if rc == 0:
+            self._connected.set()
+        else:
+            logger.error(mosquitto.connack_string(rc))
+
+    def _on_disconnect(self, client, userdata, *args):
+        logger.debug('disconnected from broker')
+        self._connected.clear()
+
+    def run(self):
         try:
-            yield session, 'OK'
+            super(ToService, self).run()
         finally:
-            session.disconnect()
+            if self._started:
+                self._client.disconnect()
+                self._client.loop_stop()
 
     def upload_data(self, session, prepared_data={}):
         logger.debug((
             'publishing on topic "{topic:s}" with retain={retain!s},'
             ' data="{data!r}"').format(data=prepared_data, **self.params))
         try:
-            session.publish(self.params['topic'], json.dumps(prepared_data),
-                            retain=self.params['retain'])
+            info = session.publish(
+                self.params['topic'], json.dumps(prepared_data),
+                retain=self.params['retain'])
         except Exception as ex:
             return False, repr(ex)
+        if info.rc != mosquitto.MQTT_ERR_SUCCESS:
+            return False, mosquitto.error_string(info.rc)
 
         if self.params['multi_topic']:
             # Publish messages, one for each item in prepared_data to
@@ -287,13 +319,13 @@ class ToService(pywws.service.LiveDataService):
                 if value == '':
                     value = 'None'
                 try:
-                    session.publish(self.params['topic'] + "/" + key, value,
-                                    retain=self.params['retain'])
+                    info = session.publish(
+                        self.params['topic'] + "/" + key, value,
+                        retain=self.params['retain'])
                 except Exception as ex:
                     return False, repr(ex)
-            # Need to make sure the messages have been flushed to the
-            # server.
-            session.loop(timeout=0.5)
+                if info.rc != mosquitto.MQTT_ERR_SUCCESS:
+                    return False, mosquitto.error_string(info.rc)
         return True, 'OK'
 
 
@@ -102,6 +102,7 @@ class ToService(pywws.service.CatchupDataService):
         'long'        : ('', False, None),
         'alt'         : ('', False, None),
         }
+    batch_size = 50
     logger = logger
     service_name = service_name
     template = """
@@ -118,22 +119,48 @@ class ToService(pywws.service.CatchupDataService):
 #calc "dew_point(data['temp_out'], data['hum_out'])" "'dew_point': %.1f,"#
 """
 
+    def __init__(self, context, check_params=True):
+        super(ToService, self).__init__(context, check_params)
+        # timestamp and values of last data sent
+        self._last_sent = None
+        # per request params, as session is shared with other services
+        self._auth = {'appid': self.params['api key']}
+        self._headers = {'Content-Type': 'application/json'}
+
     @contextmanager
     def session(self):
-        with requests.Session() as session:
-            session.headers.update({'Content-Type': 'application/json'})
-            session.params.update({'appid': self.params['api key']})
-            yield session, 'OK'
+        yield pywws.service.http_session(), 'OK'
 
     def upload_data(self, session, prepared_data={}):
+        return self.upload_data_batch(session, prepared_data=[prepared_data])
+
+    def upload_data_batch(self, session, prepared_data=[]):
+        # don't send data that hasn't changed, unless the last data
+        # sent is more than 5 minutes old
+        data = []
+        last_sent = self._last_sent
+        for item in prepared_data:
+            values = dict(item)
+            dt = values.pop('dt', None)
+            if (last_sent and dt is not None and values == last_sent[1]
+                    and dt - last_sent[0] < 300):
+                continue
+            data.append(item)
+            last_sent = dt, values
+        if not data:
+            logger.debug('data unchanged, not sent')
+            return True, 'OK'
         url = 'https://api.openweathermap.org/data/3.0/measurements'
         try:
-            rsp = session.post(url, json=[prepared_data], timeout=60)
+            rsp = session.post(
+                url, data=json.dumps(data, separators=(',', ':')),
+                params=self._auth, headers=self._headers, timeout=60)
         except Exception as ex:
             return False, repr(ex)
         if rsp.status_code != 204:
             return False, 'http status: {:d} {:s}'.format(
                 rsp.status_code, rsp.text)
+        self._last_sent = last_sent
         return True, 'OK'
 
     def register(self):
@@ -150,10 +177,10 @@ class ToService(pywws.service.CatchupDataService):
             }
         station_id = self.params['station id']
         idx = -1
-        with self.session() as session:
+        with self.session() as (session, message):
             # get current stations
             try:
-                rsp = session.get(url, timeout=60)
+                rsp = session.get(url, params=self._auth, timeout=60)
             except Exception as ex:
                 print('exception', repr(ex))
                 return
@@ -187,7 +214,8 @@ class ToService(pywws.service.CatchupDataService):
                     if yn in ('Y', 'y'):
                         try:
                             session.delete(
-                                url + '/' + station['id'], timeout=60)
+                                url + '/' + station['id'], params=self._auth,
+                                timeout=60)
                         except Exception as ex:
                             print('exception', repr(ex))
                             return
@@ -196,7 +224,8 @@ class ToService(pywws.service.CatchupDataService):
                 logger.debug('Udating station id ' + station_id)
                 url += '/' + station_id
                 try:
-                    rsp = session.put(url, json=data, timeout=60)
+                    rsp = session.put(
+                        url, json=data, params=self._auth, timeout=60)
                 except Exception as ex:
                     print('exception', repr(ex))
                     return
@@ -206,7 +235,8 @@ class ToService(pywws.service.CatchupDataService):
                 # create new station
                 logger.debug('Creating new station')
                 try:
-                    rsp = session.post(url, json=data, timeout=60)
+                    rsp = session.post(
+                        url, json=data, params=self._auth, timeout=60)
                 except Exception as ex:
                     print('exception', repr(ex))
                     return
@@ -62,6 +62,7 @@ class ToService(pywws.service.CatchupDataService):
         'password': ('', True, 'PASSWORD'),
         }
     fixed_data = {'action': 'updateraw', 'softwaretype': 'pywws'}
+    parallel_uploads = 4
     logger = logger
     service_name = service_name
     template = """
@@ -89,8 +90,7 @@ class ToService(pywws.service.CatchupDataService):
 
     @contextmanager
     def session(self):
-        with requests.Session() as session:
-            yield session, 'OK'
+        yield pywws.service.http_session(), 'OK'
 
     def upload_data(self, session, prepared_data={}):
         try:
@@ -34,6 +34,7 @@ your web space provider. If your provider doesn't allow SFTP then use
     port = 22
     password =
     privkey = /home/pywws/.ssh/webhost_rsa
+    compress = False
 
     [hourly]
     plot = ['24hrs.png.xml', 'rose_12hrs.png.xml']
@@ -51,6 +52,11 @@ structure of your web site and the sort of host you use. ``port`` is the
 port number to use. 22 is the standard value but your web space provider
 may require a different port.
 
+Setting ``compress`` to ``True`` turns on SSH compression. This can
+greatly reduce the amount of data sent when uploading text files such
+as HTML or XML, at the cost of some extra processing. It is not worth
+using if you mostly upload images, as these are already compressed.
+
 Authentication can be by password or RSA public key. To use a key you
 first need to create a passwordless key pair using ``ssh-keygen``, then
 copy the public key to your web space provider. For example::
@@ -72,12 +78,18 @@ the file is not in your ``work`` directory's ``output`` directory then
 
 from __future__ import absolute_import
 
+from ast import literal_eval
 from contextlib import contextmanager
 from datetime import timedelta
 import logging
 import os
 import sys
 
+if sys.version_info[0] >= 3:
+    import queue
+else:
+    import Queue as queue
+
 import paramiko
 
 import pywws.service
@@ -95,22 +107,28 @@ class ToService(pywws.service.FileService):
         'directory'  : ('',   True,  None),
         'port'       : ('22', True,  None),
         'privkey'    : ('',   False, None),
+        'compress'   : ('False', False, None),
         }
     logger = logger
     service_name = service_name
+    parallel_uploads = 4
 
     def __init__(self, context, check_params=True):
         super(ToService, self).__init__(context, check_params)
         self.params['port'] = int(self.params['port'])
+        self.params['compress'] = literal_eval(self.params['compress'])
         if self.params['privkey']:
             self.params['privkey'] = paramiko.RSAKey.from_private_key_file(
                 self.params['privkey'])
+        # connection is kept open between batches of uploads
+        self._transport = None
+        self._clients = queue.Queue()
 
-    @contextmanager
-    def session(self):
-        logger.info("Uploading to web site with SFTP")
+    def _connect(self):
         address = (self.params['site'], self.params['port'])
-        with paramiko.Transport(address) as transport:
+        transport = paramiko.Transport(address)
+        transport.use_compression(self.params['compress'])
+        try:
             transport.start_client(timeout=30)
             if self.params['privkey']:
                 transport.auth_publickey(username=self.params['user'],
@@ -118,17 +136,82 @@ class ToService(pywws.service.FileService):
             else:
                 transport.auth_password(username=self.params['user'],
                                         password=self.params['password'])
-            with paramiko.SFTPClient.from_transport(transport) as session:
-                session.get_channel().settimeout(20)
-                session.chdir(self.params['directory'])
-                yield session, 'OK'
+        except Exception:
+            transport.close()
+            raise
+        # stop idle connection being dropped between batches of uploads
+        transport.set_keepalive(30)
+        self._transport = transport
+
+    def _new_client(self):
+        sftp = paramiko.SFTPClient.from_transport(self._transport)
+        sftp.get_channel().settimeout(20)
+        sftp.chdir(self.params['directory'])
+        return sftp
+
+    def _close(self):
+        while not self._clients.empty():
+            self._clients.get_nowait().close()
+        if self._transport:
+            self._transport.close()
+            self._transport = None
+
+    def _reuse_client(self):
+        # keepalive may not yet have noticed a half open connection, so
+        # check the server still answers before reusing it
+        try:
+            sftp = self._clients.get_nowait()
+        except queue.Empty:
+            return self._new_client()
+        try:
+            sftp.get_channel().settimeout(20)
+            sftp.stat('.')
+        except Exception:
+            sftp.close()
+            raise
+        return sftp
+
+    @contextmanager
+    def session(self):
+        logger.info("Uploading to web site with SFTP")
+        sftp = None
+        if self._transport and self._transport.is_active():
+            try:
+                sftp = self._reuse_client()
+            except Exception as ex:
+                logger.info('Reconnecting: %s', repr(ex))
+        if not sftp:
+            self._close()
+            self._connect()
+            sftp = self._new_client()
+        self._clients.put(sftp)
+        # each thread takes an SFTP client from the queue while uploading
+        yield self._clients, 'OK'
+
+    def run(self):
+        try:
+            super(ToService, self).run()
+        finally:
+            self._close()
 
     def upload_file(self, session, path):
         target = os.path.basename(path)
+        sftp = None
         try:
-            session.put(path, target)
+            try:
+                sftp = session.get_nowait()
+            except queue.Empty:
+                sftp = self._new_client()
+            # allow at least 50 kB/s for large files
+            sftp.get_channel().settimeout(
+                max(60.0, os.path.getsize(path) / 50000.0))
+            with open(path, 'rb') as local_file:
+                sftp.putfo(local_file, target, confirm=False)
         except Exception as ex:
+            if sftp:
+                sftp.close()
             return False, repr(ex)
+        session.put(sftp)
         return True, 'OK'
 
 
@@ -66,8 +66,7 @@ class ToService(pywws.service.LiveDataService):
 
     @contextmanager
     def session(self):
-        with requests.Session() as session:
-            yield session, 'OK'
+        yield pywws.service.http_session(), 'OK'
 
     def valid_data(self, data):
         return data['temp_out'] is not None
@@ -180,6 +180,7 @@ from __future__ import absolute_import, print_function
 import codecs
 from contextlib import contextmanager
 import logging
+from multiprocessing.pool import ThreadPool
 import os
 import sys
 
@@ -244,8 +245,19 @@ class PythonTwitterHandler(object):
             max_len -= len(media[:4]) * 23
         status = status.strip()[:max_len]
         args = dict(self.kwargs)
-        if media:
-            args['media'] = media
+        media = media[:4]
+        if len(media) > 1:
+            # upload media files in parallel, then post their ids
+            # (chunked upload streams each file instead of reading it
+            # all into memory)
+            pool = ThreadPool(len(media))
+            try:
+                args['media'] = pool.map(self.api.UploadMediaChunked, media)
+            finally:
+                pool.close()
+                pool.join()
+        elif media:
+            args['media'] = [self.api.UploadMediaChunked(media[0])]
         self.api.PostUpdate(status, **args)
 
 
@@ -277,15 +289,18 @@ class ToService(pywws.service.FileService):
                 self.params['latitude'], self.params['longitude']), 'OK'
 
     def upload_file(self, session, filename):
-        with codecs.open(filename, 'r', encoding=self.encoding) as tweet_file:
-            tweet = tweet_file.read()
         media = []
-        while tweet.startswith('media'):
-            media_item, tweet = tweet.split('\n', 1)
-            media_item = media_item.split()[1]
-            if not os.path.isabs(media_item):
-                media_item = os.path.join(self.context.output_dir, media_item)
-            media.append(media_item)
+        with codecs.open(filename, 'r', encoding=self.encoding) as tweet_file:
+            # read media lines one at a time, then the rest of the tweet
+            line = tweet_file.readline()
+            while line.startswith('media'):
+                media_item = line.split()[1]
+                if not os.path.isabs(media_item):
+                    media_item = os.path.join(
+                        self.context.output_dir, media_item)
+                media.append(media_item)
+                line = tweet_file.readline()
+            tweet = line + tweet_file.read()
         try:
             session.post(tweet, media)
         except Exception as ex:
@@ -80,6 +80,7 @@ class ToService(pywws.service.CatchupDataService):
         }
     fixed_data = {'action': 'updateraw', 'softwaretype': 'pywws'}
     interval = timedelta(seconds=47)
+    parallel_uploads = 4
     logger = logger
     service_name = service_name
     template = """
@@ -112,14 +113,13 @@ class ToService(pywws.service.CatchupDataService):
 
     @contextmanager
     def session(self):
-        with requests.Session() as session:
-            yield session, 'OK'
+        yield pywws.service.http_session(), 'OK'
 
     def upload_data(self, session, prepared_data={}):
-        # extract timestamp from prepared_data
-        idx = datetime.strptime(prepared_data['dateutc'], '%Y-%m-%d %H:%M:%S')
-        # use "rapid fire" server if data is current
-        if datetime.utcnow() - idx < RTFREQ:
+        # use "rapid fire" server if data is current, comparing
+        # timestamps as strings to avoid parsing prepared_data
+        threshold = (datetime.utcnow() - RTFREQ).strftime('%Y-%m-%d %H:%M:%S')
+        if prepared_data['dateutc'] > threshold:
             prepared_data.update({'realtime': '1', 'rtfreq': '48'})
             url = 'https://rtupdate.wunderground.com/'
         else:
@@ -131,7 +131,7 @@ class ToService(pywws.service.CatchupDataService):
             return False, repr(ex)
         if rsp.status_code != 200:
             return False, 'http status: {:d}'.format(rsp.status_code)
-        text = rsp.text.strip()
+        text = rsp.content.strip().decode('ascii', 'replace')
         return text == 'success', 'server response "{:s}"'.format(text)
 
 
@@ -123,13 +123,12 @@ class ToService(pywws.service.LiveDataService):
 
     @contextmanager
     def session(self):
-        with requests.Session() as session:
-            yield session, 'OK'
+        yield pywws.service.http_session(), 'OK'
 
     def valid_data(self, data):
-        return any([data[x] is not None for x in (
+        return any(data[x] is not None for x in (
             'wind_dir', 'wind_ave', 'wind_gust', 'hum_out', 'temp_out',
-            'temp_in', 'hum_in', 'rel_pressure')])
+            'temp_in', 'hum_in', 'rel_pressure'))
 
     def upload_data(self, session, prepared_data={}):
         url = 'http://api.weathercloud.net/v01/set'
@@ -137,11 +136,15 @@ class ToService(pywws.service.LiveDataService):
             rsp = session.get(url, params=prepared_data, timeout=60)
         except Exception as ex:
             return False, repr(ex)
-        text = rsp.text.strip()
+        text = rsp.content.strip().decode('ascii', 'replace')
         if text == '200':
             return True, 'OK'
-        if text in responses:
-            return False, '{} ({})'.format(responses[text], text)
+        try:
+            code = int(text)
+        except ValueError:
+            code = None
+        if code in responses:
+            return False, '{} ({})'.format(responses[code], text)
         return False, 'unknown error ({})'.format(text)
 
 
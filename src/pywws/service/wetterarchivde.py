@@ -64,6 +64,7 @@ class ToService(pywws.service.CatchupDataService):
         }
     fixed_data = {'sid': 'pywws'}
     interval = timedelta(seconds=300)
+    parallel_uploads = 4
     logger = logger
     service_name = service_name
     template = """
@@ -89,8 +90,7 @@ class ToService(pywws.service.CatchupDataService):
 
     @contextmanager
     def session(self):
-        with requests.Session() as session:
-            yield session, 'OK'
+        yield pywws.service.http_session(), 'OK'
 
     def upload_data(self, session, prepared_data={}):
         try:
@@ -100,7 +100,12 @@ class ToService(pywws.service.CatchupDataService):
             return False, repr(ex)
         if rsp.status_code != 200:
             return False, 'http status: {:d}'.format(rsp.status_code)
-        rsp = rsp.json()
+        if not rsp.content.strip():
+            return True, 'OK'
+        try:
+            rsp = rsp.json()
+        except ValueError:
+            return True, 'server response "{:s}"'.format(rsp.text)
         if rsp:
             return True, 'server response "{!r}"'.format(rsp)
         return True, 'OK'
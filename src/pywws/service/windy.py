@@ -68,6 +68,7 @@ class ToService(pywws.service.CatchupDataService):
         'station_id'  : ('', False, 'station'),
         }
     interval = timedelta(seconds=290)
+    parallel_uploads = 4
     logger = logger
     service_name = service_name
     template = """
@@ -85,6 +86,8 @@ class ToService(pywws.service.CatchupDataService):
 
     def __init__(self, context, check_params=True):
         super(ToService, self).__init__(context, check_params)
+        self.url = ('https://stations.windy.com/pws/update/'
+                    + self.params['api_key'])
         # extend template
         if context.params.get('config', 'ws type') == '3080':
             self.template += """
@@ -93,13 +96,11 @@ class ToService(pywws.service.CatchupDataService):
 
     @contextmanager
     def session(self):
-        with requests.Session() as session:
-            yield session, 'OK'
+        yield pywws.service.http_session(), 'OK'
 
     def upload_data(self, session, prepared_data={}):
-        url = 'https://stations.windy.com/pws/update/' + self.params['api_key']
         try:
-            rsp = session.get(url, params=prepared_data, timeout=60)
+            rsp = session.get(self.url, params=prepared_data, timeout=60)
         except Exception as ex:
             return False, repr(ex)
         if rsp.status_code != 200:
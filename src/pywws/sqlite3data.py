@@ -29,12 +29,14 @@ It should also be possible for this module to form the basis of a
 full client-server based SQL module using, for example, MySQL etc.
 
 The Python builtin sqlite3 module is used which has a threadsafety of 1,
-therefore this module creates a connection with every Store (sub)class
-instance. This however brings concurrancy issues and so this module makes
-use of the underlying sqlite3's Write-Ahead-Loging and Shared Cache modes
-to relieve this. These rely on up to date sqlite3 libraries and may not
+therefore this module creates a connection for each thread that uses a
+Store (sub)class instance. This however brings concurrancy issues and so
+this module makes use of the underlying sqlite3's Write-Ahead-Loging mode
+to relieve this. This relies on up to date sqlite3 libraries and may not
 work on older networked drives which do not support the right locking
-semantics required by sqlite3.
+semantics required by sqlite3. Each connection has its own private
+cache, as SQLite's shared cache mode gives coarser table level locking
+and is not recommended for use with WAL.
 
 
 The external API is as per the original pywws file store, but with
@@ -80,27 +82,32 @@ Detailed API
 
 """
 
+try:
+    from collections.abc import Set
+except ImportError:
+    # Python 2
+    from collections import Set
 import sqlite3
 import os.path
-from threading import RLock
+from threading import local
 from datetime import date, datetime, timedelta
-
-import pytz
+from itertools import islice
 
 from pywws.weatherstation import WSDateTime, WSFloat, WSInt, WSStatus
 
+_EPOCH = datetime(1970, 1, 1)
+
 # Data type adapt: Python ==> SQLite3
 def _adapt_WSDateTime(dt):
     """Return unix timestamp of the datetime like input.
     If conversion overflows high, return sint64_max ,
     if underflows, return 0
     """
+    # Any time zone is ignored, the input is assumed to be UTC
+    if dt.tzinfo is not None:
+        dt = dt.replace(tzinfo=None)
     try:
-        ts = int(
-            (dt.replace(tzinfo=pytz.utc)
-            - datetime(1970,1,1,tzinfo=pytz.utc)
-            ).total_seconds()
-        )
+        ts = int((dt - _EPOCH).total_seconds())
     except (OverflowError,OSError):
         if dt < datetime.now():
             ts = 0
@@ -129,8 +136,6 @@ def _convert_WSInt(b):
     """Return WSInt for the given input"""
     return WSInt(b)
 
-sqlite3.enable_shared_cache(True)
-
 sqlite3.register_adapter(datetime, _adapt_WSDateTime)
 sqlite3.register_adapter(WSDateTime, _adapt_WSDateTime)
 sqlite3.register_adapter(WSStatus, _adapt_WSStatus)
@@ -145,6 +150,31 @@ sqlite3.register_converter("WSFloat", _convert_WSFloat)
 sqlite3.register_converter("WSInt", _convert_WSInt)
 
 
+class _KeysView(Set):
+    """A set-like view of a store's keys. The keys are read from the
+    database when needed, rather than all being held in memory, and are
+    iterated in ascending order.
+    """
+    def __init__(self, store):
+        self._store = store
+
+    @classmethod
+    def _from_iterable(cls, it):
+        # results of set operations are ordinary sets
+        return set(it)
+
+    def __contains__(self, key):
+        return key in self._store
+
+    def __iter__(self):
+        store = self._store
+        for row in store._connection.execute(store._sql_keys):
+            yield row[0]
+
+    def __len__(self):
+        return len(self._store)
+
+
 class CoreStore(object):
     """Provides a dictionary/list like interface
     to an underlying SQLite3 database
@@ -155,6 +185,8 @@ class CoreStore(object):
     key_list = tuple(conv.keys())
     table = ""
     _keycol = "idx"
+    # Maximum number of records written in one transaction by update()
+    update_chunk_size = 1000
     if len(conv) == 0:
         raise KeyError("No columns are defined.")
     if _keycol not in key_list:
@@ -168,18 +200,10 @@ class CoreStore(object):
         conv = self.conv
         table = self.table
         keycol = self._keycol
-        dbpath = os.path.abspath(os.path.join(dir_name, "pywws.db"))
-        self._connection = sqlite3.connect(
-            dbpath,
-            detect_types=sqlite3.PARSE_COLNAMES
-        )
-        self._connection.row_factory = sqlite3.Row
+        self._dbpath = os.path.abspath(os.path.join(dir_name, "pywws.db"))
+        self._local = local()
         con = self._connection
 
-        if con.execute(
-            "PRAGMA journal_mode=WAL"
-        ).fetchone()["journal_mode"] != "wal":
-            raise TypeError("Database is not in Write-Ahead-Log mode")
         # Create the table if its not already there.
         # Assume all data fields are NUM so that SQLite can optimise storage
         # as it will choose the smallest integer representation between 8-64bit,
@@ -204,30 +228,32 @@ class CoreStore(object):
                     )
                 )
             )
-
-        # Get all columns from the database
-        sql_key_list = tuple(
-            (row["name"],row["pk"])
-            for row in con.execute(
-                "SELECT name, pk FROM PRAGMA_TABLE_INFO(?);",
-                (table,)
+        else:
+            # Get all columns from an existing table. A table just
+            # created from conv doesn't need checking.
+            sql_key_list = tuple(
+                (row["name"],row["pk"])
+                for row in con.execute(
+                    "SELECT name, pk FROM PRAGMA_TABLE_INFO(?);",
+                    (table,)
+                )
             )
-        )
 
-        # Fetch the primary key - check there is only one
-        sql_pk = tuple(key[0] for key in sql_key_list if key[1] == 1)
-        if len(sql_pk) != 1 or sql_pk[0] != keycol:
-            raise KeyError(
-                "Mismatch between database primary key and what was expected"
-            )
+            # Fetch the primary key - check there is only one
+            sql_pk = tuple(key[0] for key in sql_key_list if key[1] == 1)
+            if len(sql_pk) != 1 or sql_pk[0] != keycol:
+                raise KeyError(
+                    "Mismatch between database primary key"
+                    " and what was expected"
+                )
 
-        # Convert this to just a set of keys
-        sql_key_list = set(key[0] for key in sql_key_list)
-        # Check that no columns are missing
-        if not set(conv.keys()) <= sql_key_list:
-            raise KeyError(
-                "Mismatch between database columns and what was expected"
-            )
+            # Convert this to just a set of keys
+            sql_key_list = set(key[0] for key in sql_key_list)
+            # Check that no columns are missing
+            if not set(conv.keys()) <= sql_key_list:
+                raise KeyError(
+                    "Mismatch between database columns and what was expected"
+                )
 
         # SQL snippet which casts all columns to the correct data types
         # for SELECT * type queries
@@ -244,23 +270,106 @@ class CoreStore(object):
             conv=conv[keycol]
         )
 
+        # Build the SQL statements once, rather than on every call.
+        # Predicates are substituted by _predicate, parameters by sqlite3
+        fmt = {
+            "selallcols": self.selallcols,
+            "selkeycol": self.selkeycol,
+            "table": table,
+            "keycol": keycol,
+            "keylist": ", ".join(key_list),
+            "vallist": ", ".join("?" * len(key_list)),
+        }
+        self._sql_select = "SELECT {selallcols} FROM {table} ".format(**fmt)
+        self._sql_delete = "DELETE FROM {table} ".format(**fmt)
+        self._pred_range = "WHERE {keycol} BETWEEN :start AND :stop".format(
+            **fmt)
+        self._pred_start = "WHERE {keycol} >= :start".format(**fmt)
+        self._pred_stop = "WHERE {keycol} <= :stop".format(**fmt)
+        self._pred_key = "WHERE {keycol} = :key".format(**fmt)
+        self._sql_len = "SELECT COUNT(*) FROM {table};".format(**fmt)
+        self._sql_contains = """SELECT 1 FROM {table}
+            WHERE {keycol} = ? LIMIT 1;""".format(**fmt)
+        self._sql_update = """INSERT OR REPLACE INTO {table} ({keylist})
+            VALUES ({vallist});""".format(**fmt)
+        self._sql_before = """SELECT {selkeycol} FROM {table} WHERE
+            {keycol} < :key ORDER BY {keycol} DESC LIMIT 1;""".format(**fmt)
+        self._sql_after = """SELECT {selkeycol} FROM {table} WHERE
+            {keycol} >= :key ORDER BY {keycol} ASC LIMIT 1;""".format(**fmt)
+        self._sql_keys = """SELECT {selkeycol} FROM {table}
+            ORDER BY {keycol} ASC;""".format(**fmt)
+        self._sql_iter = """SELECT {selallcols} FROM {table}
+            ORDER BY {keycol} ASC;""".format(**fmt)
+        self._sql_reversed = """SELECT {selallcols} FROM {table}
+            ORDER BY {keycol} DESC;""".format(**fmt)
+
+    @property
+    def _connection(self):
+        """The calling thread's connection to the database, opened on
+        first use. sqlite3 connections can only be used by the thread
+        that created them.
+        """
+        try:
+            return self._local.connection
+        except AttributeError:
+            pass
+        con = sqlite3.connect(
+            self._dbpath,
+            detect_types=sqlite3.PARSE_COLNAMES
+        )
+        con.row_factory = sqlite3.Row
+        if con.execute(
+            "PRAGMA journal_mode=WAL"
+        ).fetchone()["journal_mode"] != "wal":
+            raise TypeError("Database is not in Write-Ahead-Log mode")
+        # In WAL mode NORMAL synchronisation is still safe against
+        # corruption, but avoids an fsync on every commit. A power cut
+        # may lose the last few transactions, which will be fetched
+        # from the weather station again anyway.
+        con.execute("PRAGMA synchronous=NORMAL")
+        # Keep temporary tables and indices (e.g. for sorting) in memory
+        con.execute("PRAGMA temp_store=MEMORY")
+        # Let SQLite gather query planner statistics for any table that
+        # is missing them, as recommended for long lived connections
+        con.execute("PRAGMA optimize=0x10002")
+        self._local.connection = con
+        return con
+
     def __del__(self):
-        """Prior to object being deleted, update SQLite statistics,
-        then close connection gracefully
+        """Prior to object being deleted, let SQLite update its statistics
+        if it thinks they need it, then close connection gracefully
         """
-        with self._connection as con:
-            con.executescript(
-                """ANALYZE {}; PRAGMA wal_checkpoint(TRUNCATE);
-                """.format(self.table)
-            )
-        self._connection.close()
+        # Only this thread's connection can be used, and there's no point
+        # opening one just to close it. Other threads' connections are
+        # closed when the threads end.
+        con = getattr(getattr(self, "_local", None), "connection", None)
+        if con is None:
+            return
+        # A full ANALYZE scans the whole table, "PRAGMA optimize" only
+        # does so when the query planner would benefit. Closing the
+        # last connection to the database checkpoints the write ahead log.
+        with con:
+            con.execute("PRAGMA optimize;")
+        con.close()
+
+    def _dict_factory(self, cursor, row):
+        """Return a row of all columns as a dict"""
+        return dict(zip(self.key_list, row))
+
+    def _select(self, sql, params={}):
+        """Execute a query selecting all columns (i.e. selallcols) and
+        return a cursor that gives each record as a dict
+        """
+        # Zipping with the known column names is much quicker than
+        # converting each sqlite3.Row to a dict by name
+        cursor = self._connection.cursor()
+        cursor.row_factory = self._dict_factory
+        return cursor.execute(sql, params)
 
     def __len__(self):
         """Return the exact number of records in the table"""
         # Direct count of all records - could be slow.
-        return self._connection.execute(
-            "SELECT COUNT(*) FROM {};".format(self.table)
-        ).fetchone()[0]
+        return self._connection.execute(self._sql_len).fetchone()[0]
     
     def __length_hint__(self):
         """Return the approximate table size based on internal database
@@ -299,26 +408,20 @@ class CoreStore(object):
                         "Start index is greater than the End index"
                     )
                 else:
-                    # Substitution of the key column, but the
-                    # parameters themselves will be substituted by sqlite3
-                    predicate = "WHERE {} BETWEEN :start AND :stop".format(
-                        self._keycol
-                    )
+                    predicate = self._pred_range
             elif i.start is not None:
                 # i.stop will also be None
-                predicate = "WHERE {} >= :start".format(self._keycol)
+                predicate = self._pred_start
             elif i.stop is not None:
                 # i.start will also be None
-                predicate = "WHERE {} <= :stop".format(self._keycol)
+                predicate = self._pred_stop
             else:
                 # both are None, so equivalent to wanting everything
                 predicate = ""
             multi = True
             pred = {"start": i.start, "stop": i.stop}
         elif isinstance(i, datetime):
-            # Substitution of the key column, but the
-            # parameters themselves will be substituted by sqlite3
-            predicate = "WHERE {} = :key".format(self._keycol)
+            predicate = self._pred_key
             multi = False
             pred = {"key": i}
         else:
@@ -336,27 +439,19 @@ class CoreStore(object):
         then a value with that index must exist.
         """
         predicate, multi, params = self._predicate(i)
-        results = self._connection.execute(
-            "SELECT {} FROM {} {};".format(
-                self.selallcols,self.table,predicate), params)
+        results = self._select(self._sql_select + predicate, params)
         if multi:#
             # If multiple items are expected, give a generator
-            return (dict(row) for row in results)
+            return results
         else:
             # If one item is expected, return it directly
             item = results.fetchone()
-            return self.__missing__(i) if item is None else dict(item)
+            return self.__missing__(i) if item is None else item
 
     def __contains__(self, i):
         """Return True if i is in the table, else False"""
-        if self._connection.execute(
-            "SELECT count(*) FROM {} WHERE {} = ?;".format(
-                self.table,
-                self._keycol
-            ),(i,)).fetchone()[0] > 0:
-            return True
-        else:
-            return False
+        return self._connection.execute(
+            self._sql_contains, (i,)).fetchone() is not None
 
     def __missing__(self, i):
         raise IndexError(i)
@@ -391,21 +486,22 @@ class CoreStore(object):
         for k in E: D[k.primary_key] = k
         """
         key_list = self.key_list
-        keynone = {key:None for key in key_list}
-        # Generator which fills in missing data from the original iterator
+        # Generator which gives the values of each item in column order,
+        # filling in missing data with None
         def datagen(i):
             for datum in i:
-                tmp = keynone.copy()
-                tmp.update(datum)
-                yield tmp
-        with self._connection as con:
-            con.executemany(
-                """INSERT OR REPLACE INTO {table} ({keylist})
-                VALUES (:{vallist});
-                """.format(table=self.table,
-                    keylist=", ".join(self.key_list),
-                    vallist=", :".join(self.key_list)
-                ), datagen(i))
+                get = datum.get
+                yield [get(key) for key in key_list]
+        # Commit in chunks so a long iterator (e.g. a whole datastore
+        # transfer) doesn't build one enormous transaction in the
+        # write ahead log
+        data = datagen(i)
+        while True:
+            chunk = list(islice(data, self.update_chunk_size))
+            if not chunk:
+                break
+            with self._connection as con:
+                con.executemany(self._sql_update, chunk)
 
     def __delitem__(self, i):
         """Delete the data item or items with index i.
@@ -415,10 +511,9 @@ class CoreStore(object):
         """
         predicate, multi, params = self._predicate(i)
         with self._connection as con:
-            if con.execute("DELETE FROM {} {};".format(
-                self.table,
-                predicate
-            ), params).rowcount == 0 and multi is False:
+            if con.execute(
+                    self._sql_delete + predicate,
+                    params).rowcount == 0 and multi is False:
                 raise KeyError(i)
 
     def before(self, i):
@@ -429,13 +524,7 @@ class CoreStore(object):
             raise TypeError("'{}' is not a datetime object".format(i))
         else:
             result = self._connection.execute(
-                """SELECT {selkeycol} FROM {table} WHERE
-                {keycol} < :key ORDER BY {keycol} DESC LIMIT 1;
-                """.format(
-                    selkeycol=self.selkeycol,
-                    table=self.table,
-                    keycol=self._keycol
-                ), {"key":i}).fetchone()
+                self._sql_before, {"key":i}).fetchone()
         return result[self._keycol] if result is not None else None
 
     def after(self, i):
@@ -446,27 +535,24 @@ class CoreStore(object):
             raise TypeError("'{}' is not a datetime object".format(i))
         else:
             result = self._connection.execute(
-                """SELECT {selkeycol} FROM {table} WHERE
-                {keycol} >= :key ORDER BY {keycol} ASC LIMIT 1;""".format(
-                    selkeycol=self.selkeycol,
-                    table=self.table,
-                    keycol=self._keycol
-                ), {"key":i}).fetchone()
+                self._sql_after, {"key":i}).fetchone()
         return result[self._keycol] if result is not None else None
 
     def nearest(self, i):
         """Return datetime of record whose datetime is nearest idx."""
-        if not isinstance(i, datetime):
-            raise TypeError("'{}' is not a datetime object".format(i))
-        else:
-            result = self._connection.execute(
-                """SELECT {selkeycol} FROM {table} ORDER BY
-                ABS({keycol}-:key) ASC LIMIT 1;""".format(
-                    selkeycol=self.selkeycol,
-                    table=self.table,
-                    keycol=self._keycol
-                ), {"key":i}).fetchone()
-        return result[self._keycol] if result is not None else None
+        # Two primary key lookups are much faster than ordering the
+        # whole table by distance from i
+        hi = self.after(i)
+        if hi == i:
+            return hi
+        lo = self.before(i)
+        if hi is None:
+            return lo
+        if lo is None:
+            return hi
+        if (hi - i) < (i - lo):
+            return hi
+        return lo
 
     def flush(self):
         """Commits any uncommitted data and then flushes the write ahead log"""
@@ -476,37 +562,17 @@ class CoreStore(object):
 
     def keys(self):
         """D.keys() -> a set-like object providing a view on D's keys"""
-        return set(
-            row[self._keycol] for row in self._connection.execute(
-                """SELECT DISTINCT {} FROM {} ORDER BY {} ASC;""".format(
-                    self.selkeycol,
-                    self.table,
-                    self._keycol
-                )
-            )
-        )
+        return _KeysView(self)
 
     def __iter__(self):
         """Iterates over all rows in ascending order of key column"""
-        for row in self._connection.execute(
-            """SELECT {} FROM {} ORDER BY {} ASC;""".format(
-                self.selallcols,
-                self.table,
-                self._keycol
-            )
-        ):
-            yield dict(row)
+        for row in self._select(self._sql_iter):
+            yield row
 
     def __reversed__(self):
         """Iterates over all rows in decending order of key column"""
-        for row in self._connection.execute(
-            """SELECT {} FROM {} ORDER BY {} DESC;""".format(
-                self.selallcols,
-                self.table,
-                self._keycol
-            )
-        ):
-            yield dict(row)
+        for row in self._select(self._sql_reversed):
+            yield row
 
     def values(self):
         """D.values() -> an object providing a view on D's values"""
@@ -517,7 +583,7 @@ class CoreStore(object):
         """D.items() -> a set-like object providing a view on D's items"""
         keycol = self._keycol
         for row in self.__iter__():
-            yield (row[keycol], dict(row))
+            yield (row[keycol], row)
 
     def get(self, key, default=None):
         """D.get(k[,d]) -> D[k] if k in D, else d.  d defaults to None."""
@@ -529,7 +595,7 @@ class CoreStore(object):
     def clear(self):
         """S.clear() -> None -- remove all items from S"""
         with self._connection as con:
-            con.execute("DELETE FROM {};".format(self.table))
+            con.execute(self._sql_delete)
 
     def setdefault(self, key, default=None):
         """D.setdefault(k[,d]) -> D.get(k,d), also set D[k]=d if k not in D"""
@@ -362,6 +362,26 @@ class Template(object):
         self.monthly_data = context.monthly_data
         self.use_locale = use_locale
         self.computations = Computations(context)
+        # caches of parsed processing directives and compiled expressions
+        self._commands = {}
+        self._code = {}
+
+    def _split(self, part, file_encoding):
+        if part not in self._commands:
+            # Python 2 shlex can't handle unicode
+            if sys.version_info[0] < 3:
+                command = shlex.split(part.encode(file_encoding))
+                command = [x.decode(file_encoding) for x in command]
+            else:
+                command = shlex.split(part)
+            self._commands[part] = command
+        # return a copy, as the command may be modified
+        return list(self._commands[part])
+
+    def _compile(self, expr):
+        if expr not in self._code:
+            self._code[expr] = compile(expr, '<template>', 'eval')
+        return self._code[expr]
 
     def process(self, live_data, template_file):
         def jump(idx, count):
@@ -443,23 +463,18 @@ class Template(object):
                 if part and part[0] == '!':
                     # comment
                     continue
-                # Python 2 shlex can't handle unicode
-                if sys.version_info[0] < 3:
-                    part = part.encode(file_encoding)
-                command = shlex.split(part)
-                if sys.version_info[0] < 3:
-                    command = map(lambda x: x.decode(file_encoding), command)
+                command = self._split(part, file_encoding)
                 if command == []:
                     # empty command == print a single '#'
                     yield u'#'
-                elif command[0] in list(data.keys()) + ['calc']:
+                elif command[0] == 'calc' or command[0] in data:
                     # output a value
                     if not valid_data:
                         continue
                     # format is: key fmt_string no_value_string conversion
                     # get value
                     if command[0] == 'calc':
-                        x = eval(command[1])
+                        x = eval(self._compile(command[1]))
                         del command[1]
                     else:
                         x = data[command[0]]
@@ -473,7 +488,7 @@ class Template(object):
                             x = x.replace(tzinfo=time_zone.utc)
                     # convert data
                     if x is not None and len(command) > 3:
-                        x = eval(command[3])
+                        x = eval(self._compile(command[3]))
                     # get format
                     fmt = u'%s'
                     if len(command) > 1:
@@ -576,10 +591,7 @@ class Template(object):
             line = ''
 
     def make_text(self, template_file, live_data=None):
-        result = u''
-        for text in self.process(live_data, template_file):
-            result += text
-        return result
+        return u''.join(self.process(live_data, template_file))
 
     def make_file(self, template_file, output_file, live_data=None):
         text = self.make_text(template_file, live_data)